@@ -5,19 +5,23 @@ from logging.config import fileConfig
 # Add the backend directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from sqlalchemy import engine_from_config, pool
+from sqlalchemy import engine_from_config, pool, text
 
 # Import your models' Base.metadata for 'autogenerate' support
 from sqlmodel import SQLModel
 
 from alembic import context
-from app.core.config import settings
+from app.core.config import DATABASE_URL_SYNC, settings
+from app.core.migrations import run_all_tenant_migrations
 
 # Import all models to ensure they are registered with SQLModel.metadata
 from app.models import *  # noqa: F403
 
 target_metadata = SQLModel.metadata
 
+# 迁移中等待锁的上限, 超时直接失败而不是长时间阻塞线上流量
+LOCK_TIMEOUT = "5s"
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -30,7 +34,7 @@ config = context.config
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 
@@ -42,7 +46,7 @@ def get_database_url() -> str:
         return url
 
     # 如果alembic.ini中没有配置，则从应用配置获取
-    return settings.database_url_sync
+    return DATABASE_URL_SYNC
 
 
 def run_migrations_offline() -> None:
@@ -69,16 +73,13 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
-def run_migrations_online() -> None:
+def run_migrations_online(database_url: str) -> None:
     """Run migrations in 'online' mode.
 
     In this scenario we need to create an Engine
     and associate a connection with the context.
 
     """
-    # 获取数据库URL
-    database_url = get_database_url()
-
     # 创建引擎配置
     configuration = config.get_section(config.config_ini_section, {})
     configuration["sqlalchemy.url"] = database_url
@@ -90,6 +91,10 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text(f"SET lock_timeout = '{LOCK_TIMEOUT}'"))
+            connection.commit()
+
         context.configure(connection=connection, target_metadata=target_metadata)
 
         with context.begin_transaction():
@@ -99,4 +104,7 @@ def run_migrations_online() -> None:
 if context.is_offline_mode():
     run_migrations_offline()
 else:
-    run_migrations_online()
+    # 先迁移主数据库, 再并行迁移各租户数据库; 租户子进程只迁移自己的URL
+    run_migrations_online(get_database_url())
+    if "tenant_id" not in config.attributes and settings.tenant_database_urls:
+        run_all_tenant_migrations(settings.tenant_database_urls)
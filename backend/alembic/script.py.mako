@@ -18,6 +18,16 @@ branch_labels: Union[str, Sequence[str], None] = ${repr(branch_labels)}
 depends_on: Union[str, Sequence[str], None] = ${repr(depends_on)}
 
 
+# 为已有数据的表创建索引时, 使用 CONCURRENTLY 避免长时间锁表:
+#     with op.get_context().autocommit_block():
+#         op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_name ON table_name (column)")
+#
+# 数据迁移请分批执行, autocommit模式下每批单独提交, 直到没有受影响的行:
+#     with op.get_context().autocommit_block():
+#         while op.get_bind().execute(sa.text("UPDATE ... WHERE id IN (SELECT id ... LIMIT 1000)")).rowcount:
+#             pass
+
+
 def upgrade() -> None:
     """Upgrade schema."""
     ${upgrades if upgrades else "pass"}
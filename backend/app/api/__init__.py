@@ -1,7 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
+from app.core.deps import verify_token
+
+from .health import router as health_router
 from .user import router as user_router
 
 api_router = APIRouter()
 
-api_router.include_router(user_router, prefix="/user", tags=["users"])
+# 公开接口不挂载verify_token, 无需解析Authorization头
+api_router.include_router(health_router, tags=["health"])
+api_router.include_router(user_router, prefix="/user", tags=["users"], dependencies=[Depends(verify_token)])
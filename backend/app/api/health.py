@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Request
+
+from app.schemas.schemas import ApiResponse
+
+router = APIRouter()
+
+
+@router.get("/health", response_model=ApiResponse)
+async def health(req: Request) -> ApiResponse:
+    """健康检查, 同时返回数据库迁移状态"""
+    return ApiResponse.success({"status": "ok", "migration": getattr(req.app.state, "migration_status", None)})
@@ -2,6 +2,8 @@ import logging
 import time
 
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.deps import get_db
@@ -11,6 +13,7 @@ from app.services.user_service import UserService
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
+_profile_adapter = TypeAdapter(UserProfile)
 
 
 @router.get("/info", response_model=ApiResponse)
@@ -27,13 +30,28 @@ async def get_user_info(req: Request, db: AsyncSession = Depends(get_db)) -> Api
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error getting user info: {e}")
+        logger.error("Error getting user info: %s", e)
         raise HTTPException(500, f"Internal server error: {e!s}") from e
 
 
-@router.post("/add_info", response_model=ApiResponse)
-async def add_user_info(user_data: UserProfile, req: Request, db: AsyncSession = Depends(get_db)) -> ApiResponse:
+@router.post(
+    "/add_info",
+    response_model=ApiResponse,
+    openapi_extra={
+        "requestBody": {"content": {"application/json": {"schema": UserProfile.model_json_schema()}}, "required": True}
+    },
+)
+async def add_user_info(req: Request, db: AsyncSession = Depends(get_db)) -> ApiResponse:
     """添加用户信息，使用重试机制避免pgbouncer问题"""
+    # 直接用pydantic-core解析并校验原始请求体, 跳过中间的dict
+    try:
+        user_data = _profile_adapter.validate_json(await req.body())
+    except ValidationError as e:
+        # 与FastAPI自身的请求体校验保持一致, 错误位置以"body"开头
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        ) from e
+
     try:
         logger.info("Starting add user info process")
         user_id = req.state.user_id
@@ -43,22 +61,21 @@ async def add_user_info(user_data: UserProfile, req: Request, db: AsyncSession =
         # 设置用户ID
         user_data.id = user_id
 
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
 
         svc = UserService(db)
         # 使用重试机制创建用户档案
         new_user = await svc.create_user_profile(user_data)
 
-        end_time = time.time()
-        duration = end_time - start_time
-
-        logger.info(f"User profile created successfully in {duration:.2f} seconds")
-        logger.info(f"Created user: {new_user.id} - {new_user.name}")
+        if logger.isEnabledFor(logging.INFO):
+            duration = (time.perf_counter_ns() - start_time) / 1e9
+            logger.info("User profile created successfully in %.2f seconds", duration)
+            logger.info("Created user: %s - %s", new_user.id, new_user.name)
 
         return ApiResponse.success(new_user)
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error creating user profile: {e}")
+        logger.error("Error creating user profile: %s", e)
         raise HTTPException(500, f"Failed to create user profile: {e!s}") from e
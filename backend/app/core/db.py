@@ -1,28 +1,56 @@
+from typing import Any
+from uuid import uuid4
+
+import orjson
 from sqlalchemy import Engine, create_engine
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .config import DATABASE_URL_ASYNC, DATABASE_URL_SYNC, settings
 
-from .config import settings
+
+def _orjson_serializer(value: Any) -> str:
+    """使用orjson序列化JSON列, 比标准库json快数倍"""
+    return orjson.dumps(value).decode()
+
+
+def _asyncpg_connect_args() -> dict[str, Any]:
+    connect_args: dict[str, Any] = {
+        "server_settings": {
+            "jit": "off",  # 禁用JIT编译减少开销
+            "application_name": "fastapi_app",
+        },
+    }
+    if settings.pgbouncer_supports_prepared:
+        # pgbouncer>=1.21且max_prepared_statements>=100时支持事务模式下的prepared statement
+        connect_args["statement_cache_size"] = 500
+    else:
+        # pgbouncer兼容性关键配置
+        connect_args["statement_cache_size"] = 0  # 禁用statement cache
+        connect_args["prepared_statement_cache_size"] = 0  # 禁用prepared statement cache
+    # 每条语句使用唯一名称, 避免pgbouncer切换后端连接时出现语句名冲突
+    connect_args["prepared_statement_name_func"] = lambda: f"__app_{uuid4().hex}__"
+    return connect_args
 
 
 # 创建异步数据库引擎 - 解决pgbouncer事务模式问题
 def create_async_db_engine() -> AsyncEngine:
     engine = create_async_engine(
-        settings.database_url,
-        pool_pre_ping=False,
+        DATABASE_URL_ASYNC,
         echo=False,
-        poolclass=NullPool,  # 使用NullPool避免连接池管理问题
-        connect_args={
-            "server_settings": {
-                "jit": "off",  # 禁用JIT编译减少开销
-                "application_name": "fastapi_app",
-            },
-            # pgbouncer兼容性关键配置
-            "statement_cache_size": 0,  # 禁用statement cache
-            "prepared_statement_cache_size": 0,  # 禁用prepared statement cache
-            "prepared_statement_name_func": lambda: "",
-        },
+        # JSON/JSONB列使用orjson编解码, asyncpg方言会将其注册为连接的类型codec
+        json_serializer=_orjson_serializer,
+        json_deserializer=orjson.loads,
+        # asyncpg必须使用AsyncAdaptedQueuePool, 普通QueuePool会死锁
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=settings.db_pool_recycle,
+        pool_timeout=settings.db_pool_timeout,
+        pool_use_lifo=settings.db_pool_use_lifo,  # LIFO复用连接, 让空闲连接随pgbouncer自然回收
+        pool_pre_ping=False,  # 依靠pool_recycle淘汰陈旧连接
+        connect_args=_asyncpg_connect_args(),
     )
 
     # 在应用启动时调用此初始化
@@ -30,7 +58,7 @@ def create_async_db_engine() -> AsyncEngine:
 
 
 def create_sync_db_engine() -> Engine:
-    return create_engine(settings.database_url_sync, echo=False)
+    return create_engine(DATABASE_URL_SYNC, echo=False)
 
 
 # 创建引擎实例
@@ -1,8 +1,34 @@
+import logging
 from collections.abc import AsyncGenerator
 
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from app.core.config import settings
 from app.core.db import async_session
+from app.utils.supabase_utils import SupabaseAuthError
+
+logger = logging.getLogger(__name__)
+WHITE_LIST = frozenset({"/api/user/login", "/docs", "/openapi.json", "/api/health"})
+security = HTTPBearer(auto_error=False)
 
 
 async def get_db() -> AsyncGenerator:
     async with async_session() as s:
         yield s
+
+
+def verify_token(req: Request, cred: HTTPAuthorizationCredentials = Depends(security)) -> None:
+    if req.url.path in WHITE_LIST:
+        return
+    if not cred:
+        raise HTTPException(401, "Unauthorized")
+    if not settings.supabase_jwt_secret:
+        raise HTTPException(500, "SUPABASE_JWT_SECRET must be set in environment variables")
+    # 使用 lifespan 中创建的客户端, 复用 SupabaseAuth 的解码缓存(以令牌摘要为键), 本地一次性完成签名校验和过期校验
+    try:
+        payload = req.app.state.supabase.auth.decode_supabase_token(cred.credentials)
+    except SupabaseAuthError as e:
+        raise HTTPException(401, "Unauthorized") from e
+    req.state.user = payload.get("user_metadata")
+    req.state.user_id = payload.get("sub")
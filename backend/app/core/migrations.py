@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from alembic.config import Config
+from fastapi import FastAPI
+from sqlalchemy import text
+
+from alembic import command
+
+from .config import settings
+from .db import create_sync_db_engine
+
+logger = logging.getLogger(__name__)
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+# 多个实例同时启动时, 通过PostgreSQL advisory lock保证只有一个实例执行迁移
+MIGRATION_LOCK_ID = 7_310_426_001
+
+
+def _get_alembic_config() -> Config:
+    cfg = Config(str(BACKEND_ROOT / "alembic.ini"))
+    cfg.set_main_option("script_location", str(BACKEND_ROOT / "alembic"))
+    # 应用内执行迁移时不重新配置logging, 避免覆盖应用的日志设置
+    cfg.attributes["configure_logger"] = False
+    return cfg
+
+
+def run_tenant_migrations(tenant_id: str, database_url: str) -> None:
+    """在子进程中将单个租户数据库升级到最新版本, 日志前缀为租户ID"""
+    logging.basicConfig(
+        level=logging.INFO, format=f"[{tenant_id}] %(levelname)-5.5s [%(name)s] %(message)s", force=True
+    )
+    cfg = _get_alembic_config()
+    # ini配置支持%插值, URL中的百分号编码需要转义
+    cfg.set_main_option("sqlalchemy.url", database_url.replace("%", "%%"))
+    # 标记为租户迁移, env.py只迁移当前URL而不再分发租户任务
+    cfg.attributes["tenant_id"] = tenant_id
+    command.upgrade(cfg, "head")
+
+
+def run_all_tenant_migrations(tenant_urls: dict[str, str]) -> None:
+    """每个租户数据库相互独立, 使用多进程并行迁移"""
+    if not tenant_urls:
+        return
+    # 使用spawn而不是fork: 调用方可能是多线程的应用进程, 且Windows不支持fork
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(len(tenant_urls), os.cpu_count() or 1), mp_context=mp_context) as pool:
+        futures = [pool.submit(run_tenant_migrations, tenant_id, url) for tenant_id, url in tenant_urls.items()]
+        for future in futures:
+            future.result()
+
+
+def upgrade_head() -> None:
+    """在持有advisory lock的情况下将数据库升级到最新版本"""
+    engine = create_sync_db_engine()
+    try:
+        with engine.connect() as lock_conn:
+            deadline = time.monotonic() + settings.migration_lock_timeout
+            while not lock_conn.scalar(text("SELECT pg_try_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID}):
+                if time.monotonic() > deadline:
+                    raise TimeoutError("Timed out waiting for migration lock")
+                time.sleep(1)
+
+            try:
+                command.upgrade(_get_alembic_config(), "head")
+            finally:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+    finally:
+        engine.dispose()
+
+
+async def run_migrations(app: FastAPI, *, raise_on_error: bool = False) -> None:
+    """在线程中执行迁移, 并将状态记录在app.state.migration_status
+
+    Args:
+        app: FastAPI应用
+        raise_on_error: 迁移失败时是否抛出异常; 同步模式下应为True, 使启动失败而不是在未迁移的数据库上运行
+
+    """
+    app.state.migration_status = "running"
+    try:
+        await asyncio.to_thread(upgrade_head)
+        app.state.migration_status = "succeeded"
+        logger.info("Database migrations succeeded")
+    except Exception as e:
+        app.state.migration_status = "failed"
+        logger.error(f"Database migrations failed: {e}")
+        if raise_on_error:
+            raise
@@ -1,39 +1,46 @@
+import asyncio
 import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
-from fastapi import Depends, FastAPI, HTTPException, Request
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 
 from app.api import api_router
+from app.core.config import settings
+from app.core.migrations import run_migrations
 from app.utils.supabase_utils import get_supbase
 
 logger = logging.getLogger(__name__)
-WHITE_LIST = {"/api/user/login", "/docs", "/openapi.json", "/api/health"}
-security = HTTPBearer(auto_error=False)
-supabase = get_supbase()
 
 
-def verify_token(req: Request, cred: HTTPAuthorizationCredentials = Depends(security)) -> None:
-    if req.url.path in WHITE_LIST:
-        return
-    if not cred:
-        raise HTTPException(401, "Unauthorized")
-    global supabase
-    if supabase.auth.is_token_expired(cred.credentials):
-        logger.error("Token expired")
-        raise HTTPException(401, "Unauthorized")
-    payload = supabase.auth.decode_supabase_token(cred.credentials)
-    req.state.user = payload.get("user_metadata")
-    req.state.user_id = payload.get("sub")
-
-
-app = FastAPI(dependencies=[Depends(verify_token)], title="Simple Backend")
-
-
-@app.on_event("startup")
-def setup() -> None:
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     logger.info("Starting up")
-    global supabase
-    app.state.supabase = supabase
-
+    # 每个worker进程在启动时各自创建客户端, 避免fork前初始化
+    app.state.supabase = get_supbase()
+
+    app.state.migration_status = "pending"
+    if settings.migration_mode == "async":
+        # 后台执行迁移, 不阻塞应用启动
+        app.state.migration_task = asyncio.create_task(run_migrations(app))
+    elif settings.migration_mode == "sync":
+        # 阻塞迁移失败时直接抛出, 使应用启动失败
+        await run_migrations(app, raise_on_error=True)
+    else:
+        app.state.migration_status = "skipped"
+
+    yield
+
+
+app = FastAPI(
+    title="Simple Backend",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+# 压缩较大的响应(如LLM结果), 小响应不值得额外的CPU开销
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
 
 app.include_router(api_router, prefix="/api")
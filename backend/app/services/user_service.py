@@ -1,7 +1,7 @@
 import logging
 
+from cachetools import TTLCache
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import select
 
 from app.models.user import UserProfile
 
@@ -9,12 +9,23 @@ logger = logging.getLogger(__name__)
 
 
 class UserService:
+    # 进程内用户档案缓存, TTL较短以兼顾多worker之间的一致性
+    _cache: TTLCache[str, UserProfile] = TTLCache(maxsize=10_000, ttl=30)
+
     def __init__(self, db: AsyncSession):
         self.db = db
 
     async def get_by_id(self, user_id: str) -> UserProfile | None:
         try:
-            user_profile = await self.db.scalar(select(UserProfile).where(UserProfile.id == user_id))
+            # 缓存中保存与会话分离的副本, 命中时也返回副本, 避免不同请求共享同一个对象
+            cached = self._cache.get(user_id)
+            if cached is not None:
+                return UserProfile.model_validate(cached)
+
+            # 主键查询走identity map, 无需每次编译SELECT语句
+            user_profile = await self.db.get(UserProfile, user_id)
+            if user_profile is not None:
+                self._cache[user_id] = UserProfile.model_validate(user_profile)
             return user_profile
         except Exception as e:
             logger.error(f"Error getting user by ID {user_id}: {e}")
@@ -24,17 +35,43 @@ class UserService:
         try:
             user_profile = UserProfile(**data.model_dump())
 
+            # id由客户端指定且没有服务端默认值, commit即可持久化, 无需flush和refresh
             self.db.add(user_profile)
-
-            await self.db.flush()
-            logger.debug("User profile added and flushed")
-
             await self.db.commit()
             logger.debug("Transaction committed successfully")
-
-            await self.db.refresh(user_profile)
+            self._cache.pop(user_profile.id, None)
 
             return user_profile
         except Exception as e:
             logger.error(f"Error creating user profile: {e}")
             raise
+
+    async def bulk_create(self, profiles: list[UserProfile], batch_size: int = 10_000) -> int:
+        """通过COPY批量导入用户档案, 绕过ORM逐行INSERT
+
+        Returns:
+            int: 导入的记录数
+
+        """
+        try:
+            conn = await self.db.connection()
+            raw = await conn.get_raw_connection()
+            asyncpg_conn = raw.driver_connection
+
+            # COPY绕过了SQLAlchemy, 适配器不会为其开启事务, 需要显式开启以保证整体导入的原子性
+            async with asyncpg_conn.transaction():  # type: ignore[union-attr]
+                for i in range(0, len(profiles), batch_size):
+                    await asyncpg_conn.copy_records_to_table(  # type: ignore[union-attr]
+                        UserProfile.__tablename__,
+                        records=[(p.id, p.name, p.avatar) for p in profiles[i : i + batch_size]],
+                        columns=["id", "name", "avatar"],
+                    )
+
+            await self.db.commit()
+            for p in profiles:
+                self._cache.pop(p.id, None)
+            logger.debug(f"Bulk created {len(profiles)} user profiles")
+            return len(profiles)
+        except Exception as e:
+            logger.error(f"Error bulk creating user profiles: {e}")
+            raise
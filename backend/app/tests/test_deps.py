@@ -0,0 +1,50 @@
+import hashlib
+import time
+
+import jwt
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.requests import Request
+
+import app.utils.supabase_utils as supabase_utils
+from app.core.config import settings
+from app.core.deps import verify_token
+from app.utils.supabase_utils import get_supbase
+
+SECRET = "test-secret-with-at-least-32-bytes"  # noqa: S105
+
+
+def _request() -> Request:
+    app = FastAPI()
+    app.state.supabase = get_supbase()
+    return Request({"type": "http", "path": "/api/user/info", "headers": [], "app": app})
+
+
+def _credentials(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+@pytest.fixture(autouse=True)
+def jwt_secret(monkeypatch):
+    monkeypatch.setattr(settings, "supabase_jwt_secret", SECRET)
+    monkeypatch.setattr(supabase_utils, "_JWT_SECRET_BYTES", SECRET.encode())
+
+
+def test_verify_token_uses_digest_cache():
+    token = jwt.encode({"sub": "user-2", "aud": "authenticated", "exp": int(time.time()) + 60}, SECRET)
+    req = _request()
+
+    verify_token(req, _credentials(token))
+    assert req.state.user_id == "user-2"
+    # 缓存以令牌摘要为键, 不保存原始令牌
+    assert hashlib.sha256(token.encode()).digest() in supabase_utils._token_cache
+    assert token not in supabase_utils._token_cache
+
+
+def test_verify_token_rejects_expired():
+    token = jwt.encode({"sub": "user-3", "aud": "authenticated", "exp": int(time.time()) - 60}, SECRET)
+
+    with pytest.raises(HTTPException) as exc_info:
+        verify_token(_request(), _credentials(token))
+    assert exc_info.value.status_code == 401
@@ -0,0 +1,53 @@
+import pytest
+from fastapi import FastAPI
+from pydantic import ValidationError
+from sqlalchemy import create_engine, inspect
+
+import app.core.migrations as migrations
+from app.core.config import Settings
+from app.core.migrations import run_all_tenant_migrations, run_migrations
+
+
+def test_run_all_tenant_migrations(tmp_path):
+    tenant_urls = {tenant_id: f"sqlite:///{tmp_path / f'{tenant_id}.db'}" for tenant_id in ("tenant_a", "tenant_b")}
+
+    run_all_tenant_migrations(tenant_urls)
+
+    for url in tenant_urls.values():
+        engine = create_engine(url)
+        try:
+            tables = set(inspect(engine).get_table_names())
+        finally:
+            engine.dispose()
+        assert {"alembic_version", "user_profile", "llm_result"} <= tables
+
+
+def test_run_all_tenant_migrations_empty():
+    run_all_tenant_migrations({})
+
+
+@pytest.mark.asyncio
+async def test_run_migrations_failure(monkeypatch):
+    def fail() -> None:
+        raise RuntimeError("migration failed")
+
+    monkeypatch.setattr(migrations, "upgrade_head", fail)
+
+    # 后台模式只记录状态
+    app = FastAPI()
+    await run_migrations(app)
+    assert app.state.migration_status == "failed"
+
+    # 同步模式抛出异常, 使启动失败
+    with pytest.raises(RuntimeError):
+        await run_migrations(app, raise_on_error=True)
+    assert app.state.migration_status == "failed"
+
+
+def test_migration_mode_validation(monkeypatch):
+    monkeypatch.setenv("MIGRATION_MODE", "sync")
+    assert Settings().migration_mode == "sync"
+
+    monkeypatch.setenv("MIGRATION_MODE", "snyc")
+    with pytest.raises(ValidationError):
+        Settings()
@@ -1,6 +1,11 @@
+import asyncio
+
 import pytest
+from postgrest.exceptions import APIError
 
+import app.utils.supabase_utils as supabase_utils
 from app.utils.supabase_utils import *
+from app.utils.supabase_utils import _apply_filters, _dedupe_filters
 
 
 def test_get_supabase_client():
@@ -46,7 +51,7 @@ async def test_supabase_storage():
     supabase_storage = SupabaseStorage(get_supabase_client())
     assert isinstance(supabase_storage, SupabaseStorage)
 
-    result = await supabase_storage.generate_filename("test.txt")
+    result = supabase_storage.generate_filename("test.txt")
     assert isinstance(result, str)
     assert result.endswith(".txt")
 
@@ -57,3 +62,153 @@ async def test_supabase_storage():
     result = await supabase_storage.list_files("images", limit=1)
     assert isinstance(result, list)
     assert len(result) == 1
+
+
+def test_decode_supabase_token_cache(monkeypatch):
+    secret = "test-secret-with-at-least-32-bytes"  # noqa: S105
+    monkeypatch.setattr(supabase_utils, "_JWT_SECRET_BYTES", secret.encode())
+    token = jwt.encode({"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 60}, secret)
+    auth = SupabaseAuth(None)
+
+    payload = auth.decode_supabase_token(token)
+    assert payload["sub"] == "user-1"
+
+    # 命中缓存时不再调用jwt.decode
+    monkeypatch.setattr(jwt, "decode", lambda *args, **kwargs: pytest.fail("token should be cached"))
+    assert auth.decode_supabase_token(token) == payload
+
+
+def test_is_token_expired(monkeypatch):
+    secret = "test-secret-with-at-least-32-bytes"  # noqa: S105
+    monkeypatch.setattr(supabase_utils, "_JWT_SECRET_BYTES", secret.encode())
+    auth = SupabaseAuth(None)
+
+    expired = jwt.encode({"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) - 60}, secret)
+    valid = jwt.encode({"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 60}, secret)
+    assert auth.is_token_expired(expired) is True
+    assert auth.is_token_expired(valid) is False
+    assert auth.is_token_expired("not-a-token") is False
+
+    # 已缓存的令牌直接判定为未过期, 不再调用jwt.decode
+    auth.decode_supabase_token(valid)
+    monkeypatch.setattr(jwt, "decode", lambda *args, **kwargs: pytest.fail("token should be cached"))
+    assert auth.is_token_expired(valid) is False
+
+
+def test_dedupe_filters():
+    assert _dedupe_filters({"id": [3, 1, 3], "name": "a"}) == {"id": (1, 3), "name": "a"}
+    # 无法排序的值按键单独回退为保序去重, 不影响其他键
+    assert _dedupe_filters({"id": [1, "a", 1], "y": [2, 1, 2]}) == {"id": (1, "a"), "y": (1, 2)}
+
+
+def test_apply_filters():
+    query = get_supabase_client().table("user_profile").select("*")
+    query = _apply_filters(query, {"id": [1, "a"], "y": [2, 1, 2], "name": "a", "avatar": None})
+    params = query.request.params
+    assert params["id"] == "in.(1,a)"
+    assert params["y"] == "in.(1,2)"
+    assert params["name"] == "eq.a"
+    assert params["avatar"] == "is.null"
+
+
+@pytest.mark.asyncio
+async def test_supabase_db_select_coalescing(monkeypatch):
+    calls = 0
+
+    async def fake_select(self, *args):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return [{"id": "user-1"}]
+
+    monkeypatch.setattr(SupabaseDB, "_select", fake_select)
+    supabase_db = SupabaseDB(None)
+
+    results = await asyncio.gather(*(supabase_db.select("user_profile", filters={"id": "user-1"}) for _ in range(3)))
+    assert calls == 1
+    assert all(result == [{"id": "user-1"}] for result in results)
+
+
+@pytest.mark.asyncio
+async def test_supabase_db_select_leader_cancel(monkeypatch):
+    async def fake_select(self, *args):
+        await asyncio.sleep(0.05)
+        return [{"id": "user-1"}]
+
+    monkeypatch.setattr(SupabaseDB, "_select", fake_select)
+    supabase_db = SupabaseDB(None)
+
+    leader = asyncio.create_task(supabase_db.select("user_profile", filters={"id": "user-1"}))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(supabase_db.select("user_profile", filters={"id": "user-1"}))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == [{"id": "user-1"}]
+    assert leader.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_supabase_db_check_users_exist(monkeypatch):
+    params = {}
+
+    async def fake_run_sync(fn, *args):
+        params.update(fn.__self__.request.params)
+        return type("Result", (), {"data": [{"id": "user-1"}]})()
+
+    monkeypatch.setattr(supabase_utils, "_run_sync", fake_run_sync)
+    supabase_db = SupabaseDB(get_supabase_client())
+
+    assert await supabase_db.check_users_exist(["user-2", "user-1", "user-2"]) == {"user-1"}
+    # 重复的ID在拼接URL前已去重
+    assert params["id"] == "in.(user-1,user-2)"
+    assert await supabase_db.check_user_exists("user-1") is True
+
+
+@pytest.mark.asyncio
+async def test_supabase_db_check_users_exist_db_error(monkeypatch):
+    async def fake_run_sync(fn, *args):
+        raise APIError({"message": "boom"})
+
+    monkeypatch.setattr(supabase_utils, "_run_sync", fake_run_sync)
+    supabase_db = SupabaseDB(get_supabase_client())
+
+    assert await supabase_db.check_users_exist(["user-1"]) == set()
+
+
+@pytest.mark.asyncio
+async def test_supabase_db_upsert_chunking(monkeypatch):
+    chunk_sizes = []
+
+    async def fake_upsert_chunk(self, table, data, on_conflict, return_columns):
+        chunk_sizes.append(len(data))
+        return data
+
+    monkeypatch.setattr(SupabaseDB, "_upsert_chunk", fake_upsert_chunk)
+    supabase_db = SupabaseDB(None)
+
+    data = [{"id": str(i)} for i in range(1200)]
+    result = await supabase_db.upsert("user_profile", data, chunk_size=500)
+    assert sorted(chunk_sizes) == [200, 500, 500]
+    assert result == data
+
+
+@pytest.mark.asyncio
+async def test_supabase_db_select_pagination(monkeypatch):
+    params = {}
+
+    async def fake_run_sync(fn, *args):
+        params.update(fn.__self__.request.params)
+        return type("Result", (), {"data": []})()
+
+    monkeypatch.setattr(supabase_utils, "_run_sync", fake_run_sync)
+    supabase_db = SupabaseDB(get_supabase_client())
+
+    await supabase_db.select("user_profile", offset=20)
+    assert params["offset"] == "20"
+    assert "limit" not in params
+
+    params.clear()
+    await supabase_db.select("user_profile", limit=5, offset=20)
+    assert params["offset"] == "20"
+    assert params["limit"] == "5"
@@ -0,0 +1,19 @@
+from fastapi.testclient import TestClient
+
+from app.core.deps import verify_token
+from app.main import app
+
+
+def test_add_user_info_validation_error_loc():
+    app.dependency_overrides[verify_token] = lambda: None
+    try:
+        client = TestClient(app)
+        response = client.post("/api/user/add_info", content=b"[]")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 422
+    error = response.json()["detail"][0]
+    assert error["loc"] == ["body"]
+    # 与FastAPI自身的校验错误格式一致, 不包含文档链接
+    assert "url" not in error
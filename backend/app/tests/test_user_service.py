@@ -0,0 +1,100 @@
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.models.user import UserProfile
+from app.services.user_service import UserService
+
+
+class FakeAsyncpgConnection:
+    def __init__(self, fail_on_batch: int | None = None):
+        self.fail_on_batch = fail_on_batch
+        self.committed: list[list[tuple]] = []
+        self.pending: list[list[tuple]] | None = None
+
+    @asynccontextmanager
+    async def transaction(self):
+        self.pending = []
+        try:
+            yield
+        except BaseException:
+            self.pending = None
+            raise
+        self.committed.extend(self.pending)
+        self.pending = None
+
+    async def copy_records_to_table(self, table_name, *, records, columns):
+        assert self.pending is not None, "COPY must run inside a transaction"
+        if len(self.pending) + 1 == self.fail_on_batch:
+            raise RuntimeError("copy failed")
+        self.pending.append(records)
+
+
+class FakeSession:
+    def __init__(self, driver_connection: FakeAsyncpgConnection):
+        self.driver_connection = driver_connection
+        self.commits = 0
+
+    async def connection(self):
+        return self
+
+    async def get_raw_connection(self):
+        return self
+
+    async def commit(self):
+        self.commits += 1
+
+
+def _profiles(n: int) -> list[UserProfile]:
+    return [UserProfile(id=str(i), name=f"user-{i}") for i in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_single_transaction():
+    asyncpg_conn = FakeAsyncpgConnection()
+    session = FakeSession(asyncpg_conn)
+
+    count = await UserService(session).bulk_create(_profiles(5), batch_size=2)  # type: ignore[arg-type]
+    assert count == 5
+    assert [len(batch) for batch in asyncpg_conn.committed] == [2, 2, 1]
+    assert session.commits == 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_rolls_back_all_batches():
+    asyncpg_conn = FakeAsyncpgConnection(fail_on_batch=3)
+    session = FakeSession(asyncpg_conn)
+
+    with pytest.raises(RuntimeError):
+        await UserService(session).bulk_create(_profiles(5), batch_size=2)  # type: ignore[arg-type]
+    assert asyncpg_conn.committed == []
+    assert session.commits == 0
+
+
+class FakeGetSession:
+    def __init__(self, profile: UserProfile):
+        self.profile = profile
+        self.gets = 0
+
+    async def get(self, model, ident):
+        self.gets += 1
+        return self.profile
+
+
+@pytest.mark.asyncio
+async def test_get_by_id_caches_detached_copy():
+    UserService._cache.clear()
+    profile = UserProfile(id="cached-user", name="before")
+    session = FakeGetSession(profile)
+    svc = UserService(session)  # type: ignore[arg-type]
+
+    assert await svc.get_by_id("cached-user") is profile
+    # 会话中的对象被修改不影响缓存
+    profile.name = "after"
+
+    first = await svc.get_by_id("cached-user")
+    second = await svc.get_by_id("cached-user")
+    assert session.gets == 1
+    assert first is not None and first.name == "before"
+    assert first is not second
+    UserService._cache.clear()
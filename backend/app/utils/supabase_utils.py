@@ -1,20 +1,32 @@
+import asyncio
+import hashlib
 import logging
-import uuid
+import secrets
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from functools import lru_cache
+from functools import partial
 from pathlib import Path
-from typing import Any, cast
+from typing import IO, TYPE_CHECKING, Any, cast
 
 import boto3
-from jose import JWTError, jwt
+import jwt
+from botocore.client import Config
+from cachetools import TLRUCache
 from postgrest.exceptions import APIError
-from pydantic import BaseModel
+from postgrest.types import ReturnMethod
 from storage3.types import FileOptions, ListBucketFilesOptions
 from supabase import Client, create_client
 from supabase.client import ClientOptions
 
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    from jwt.types import Options
+
 # 设置日志
 logger = logging.getLogger(__name__)
 
@@ -49,7 +61,12 @@ class SupabaseRealtimeError(SupabaseError):
     pass
 
 
-@lru_cache
+# 客户端单例, 使用双重检查锁保证多线程下只创建一次
+_supabase_client: Client | None = None
+_s3_client: Any = None
+_client_lock = threading.Lock()
+
+
 def get_supabase_client() -> Client:
     """获取 Supabase 客户端实例(单例模式)
 
@@ -60,22 +77,28 @@ def get_supabase_client() -> Client:
         SupabaseError: 当环境变量配置不正确时
 
     """
+    global _supabase_client
+    if _supabase_client is not None:
+        return _supabase_client
+
     url = settings.supabase_url
     key = settings.supabase_key
 
     if not url or not key:
         raise SupabaseError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
 
-    try:
-        # 使用客户端选项配置超时等参数
-        options = ClientOptions(auto_refresh_token=True, persist_session=True)
-        return create_client(url, key, options)
-    except Exception as e:
-        logger.error(f"Failed to create Supabase client: {e}")
-        raise SupabaseError(f"Failed to create Supabase client: {e}") from e
+    with _client_lock:
+        if _supabase_client is None:
+            try:
+                # 使用客户端选项配置超时等参数
+                options = ClientOptions(auto_refresh_token=True, persist_session=True)
+                _supabase_client = create_client(url, key, options)
+            except Exception as e:
+                logger.error(f"Failed to create Supabase client: {e}")
+                raise SupabaseError(f"Failed to create Supabase client: {e}") from e
+    return _supabase_client
 
 
-@lru_cache
 def get_s3_client():  # type: ignore
     """获取 S3 客户端实例(使用 Supabase S3 兼容端点)
 
@@ -83,14 +106,57 @@ def get_s3_client():  # type: ignore
         boto3.client: S3 客户端实例
 
     """
-    return boto3.client(  # type: ignore
-        "s3",
-        endpoint_url=f"{settings.supabase_url}/storage/v1/s3",
-        aws_access_key_id=settings.supabase_key,
-        aws_secret_access_key=settings.supabase_key,
-        region_name="auto",
-        config=boto3.session.Config(s3={"addressing_style": "path"}),  # type: ignore[attr-defined]
-    )
+    global _s3_client
+    if _s3_client is not None:
+        return _s3_client
+
+    with _client_lock:
+        if _s3_client is None:
+            _s3_client = boto3.client(
+                "s3",
+                endpoint_url=f"{settings.supabase_url}/storage/v1/s3",
+                aws_access_key_id=settings.supabase_key,
+                aws_secret_access_key=settings.supabase_key,
+                region_name="auto",
+                config=Config(
+                    s3={"addressing_style": "path"},
+                    # 默认连接池只有10个连接, 并发上传时会频繁丢弃连接并重新握手
+                    max_pool_connections=50,
+                    retries={"mode": "standard", "max_attempts": 3},
+                    tcp_keepalive=True,
+                ),
+            )
+    return _s3_client
+
+
+# supabase-py 同步客户端的阻塞调用放到共享线程池执行, 避免阻塞事件循环
+_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="supabase")
+
+
+async def _run_sync[T](func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """在线程池中执行同步函数"""
+    return await asyncio.get_running_loop().run_in_executor(_EXECUTOR, partial(func, *args, **kwargs))
+
+
+# JWT校验参数只在启动时准备一次
+_JWT_SECRET_BYTES = settings.supabase_jwt_secret.encode() if settings.supabase_jwt_secret else None
+_JWT_ALGS = ["HS256"]
+_JWT_OPTIONS: "Options" = {"verify_signature": True, "verify_aud": True}
+# is_token_expired 自行比较 exp, 解码时关闭过期校验
+_JWT_OPTIONS_NO_EXP: "Options" = {**_JWT_OPTIONS, "verify_exp": False}
+
+# 令牌解码结果缓存, 以令牌的SHA-256摘要为键, 不保存原始令牌
+_TOKEN_CACHE_TTL = 5
+
+
+def _token_ttu(_key: bytes, payload: dict[str, Any], now: float) -> float:
+    """缓存时间不超过令牌剩余有效期, 避免过期令牌仍命中缓存"""
+    exp = payload.get("exp")
+    return min(exp, now + _TOKEN_CACHE_TTL) if exp else now + _TOKEN_CACHE_TTL
+
+
+_token_cache: TLRUCache = TLRUCache(maxsize=10_000, ttu=_token_ttu, timer=time.time)
+_token_cache_lock = threading.RLock()
 
 
 class SupabaseAuth:
@@ -113,17 +179,26 @@ class SupabaseAuth:
             token: JWT 令牌字符串
 
         Returns:
-            bool: 令牌是否有效(未过期)
+            bool: 令牌是否已过期, 令牌无效时返回 False
 
         """
-        try:
-            payload = self.decode_supabase_token(token)
-            exp = payload.get("exp")
-            if exp:
-                return datetime.fromtimestamp(exp) < datetime.now()
+        # 缓存条目在 exp 时失效, 命中即说明令牌有效且未过期
+        with _token_cache_lock:
+            if hashlib.sha256(token.encode()).digest() in _token_cache:
+                return False
+
+        if _JWT_SECRET_BYTES is None:
             return False
-        except (SupabaseAuthError, ValueError):
+        try:
+            # 过期令牌会使 decode_supabase_token 抛出异常, 这里关闭过期校验后自行比较 exp
+            payload = jwt.decode(
+                token, _JWT_SECRET_BYTES, algorithms=_JWT_ALGS, audience="authenticated", options=_JWT_OPTIONS_NO_EXP
+            )
+        except jwt.InvalidTokenError:
             return False
+        exp = payload.get("exp")
+        # 直接比较时间戳, 避免构造datetime对象
+        return exp is not None and exp < time.time()
 
     def decode_supabase_token(self, token: str) -> dict[str, Any]:
         """解码 Supabase JWT 令牌
@@ -138,16 +213,24 @@ class SupabaseAuth:
             SupabaseAuthError: 当令牌无效或解码失败时
 
         """
-        jwt_secret = settings.supabase_jwt_secret
-
-        if not jwt_secret:
+        if _JWT_SECRET_BYTES is None:
             raise SupabaseAuthError("SUPABASE_JWT_SECRET must be set in environment variables")
 
+        cache_key = hashlib.sha256(token.encode()).digest()
+        with _token_cache_lock:
+            cached = _token_cache.get(cache_key)
+        if cached is not None:
+            return cast(dict[str, Any], cached)
+
         try:
-            payload = jwt.decode(token, jwt_secret, algorithms=["HS256"], audience="authenticated")
+            payload = jwt.decode(
+                token, _JWT_SECRET_BYTES, algorithms=_JWT_ALGS, audience="authenticated", options=_JWT_OPTIONS
+            )
             logger.info("Successfully decoded Supabase token")
+            with _token_cache_lock:
+                _token_cache[cache_key] = payload
             return payload
-        except JWTError as e:
+        except jwt.InvalidTokenError as e:
             logger.error(f"Failed to decode Supabase token: {e}")
             raise SupabaseAuthError("Invalid token") from e
 
@@ -159,7 +242,7 @@ class SupabaseAuth:
 
         """
         try:
-            self.client.auth.sign_out()
+            await _run_sync(self.client.auth.sign_out)
             self.logger.info("Successfully signed out")
             return True
         except Exception as e:
@@ -177,7 +260,7 @@ class SupabaseAuth:
 
         """
         try:
-            response = self.client.auth.refresh_session(refresh_token)
+            response = await _run_sync(self.client.auth.refresh_session, refresh_token)
             if response.session:
                 self.logger.info("Successfully refreshed token")
                 return {
@@ -191,6 +274,79 @@ class SupabaseAuth:
             return None
 
 
+def _normalize_filter_value(value: Any) -> Any:
+    """列表值去重排序; 元素无法排序时保序去重, 无法哈希时保持原顺序"""
+    if not isinstance(value, list | tuple | set):
+        return value
+    try:
+        return tuple(sorted(set(value)))
+    except TypeError:
+        pass
+    try:
+        return tuple(dict.fromkeys(value))
+    except TypeError:
+        return tuple(value)
+
+
+def _dedupe_filters(filters: dict[str, Any]) -> dict[str, Any]:
+    """规范化过滤条件, 使相同条件生成相同的查询参数, 每个键单独规范化"""
+    return {key: _normalize_filter_value(value) for key, value in filters.items()}
+
+
+def _apply_filters(query: Any, filters: dict[str, Any]) -> Any:
+    """将过滤条件应用到 PostgREST 查询: None 使用 is null, 列表使用 in, 其他使用 eq"""
+    for key, value in _dedupe_filters(filters).items():
+        if value is None:
+            query = query.is_(key, "null")
+        elif isinstance(value, list | tuple | set):
+            query = query.in_(key, value)
+        else:
+            query = query.eq(key, value)
+    return query
+
+
+# 正在执行中的 select 查询, 用于合并相同的并发读请求
+_inflight: dict[tuple, asyncio.Task[list[dict[str, Any]]]] = {}
+
+
+def _select_key(
+    client: Client,
+    table: str,
+    columns: str,
+    filters: dict[str, Any] | None,
+    order_by: str | None,
+    limit: int | None,
+    offset: int | None,
+) -> tuple | None:
+    """生成 select 查询的合并键, 过滤条件不可哈希时返回 None(不合并)"""
+    try:
+        key = (
+            id(client),
+            table,
+            columns,
+            tuple(sorted(_dedupe_filters(filters or {}).items())),
+            order_by,
+            limit,
+            offset,
+        )
+        hash(key)
+        return key
+    except TypeError:
+        return None
+
+
+def _finish_inflight(key: tuple, task: asyncio.Task) -> None:
+    """查询结束后移除合并登记, 并标记异常已被获取, 没有等待者时避免告警"""
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    if not task.cancelled():
+        task.exception()
+
+
+# 分块 upsert 的最大并发请求数
+_UPSERT_CONCURRENCY = 4
+
+
 class SupabaseDB:
     """Supabase 数据库操作工具类"""
 
@@ -230,25 +386,48 @@ class SupabaseDB:
             SupabaseDBError: 查询失败时
 
         """
+        key = _select_key(self.client, table, columns, filters, order_by, limit, offset)
+        if key is None:
+            return await self._select(table, columns, filters, order_by, limit, offset)
+
+        # 相同的并发查询只发起一次请求, 查询在独立的 Task 中执行, 所有调用者通过 shield 等待
+        # 任一调用者被取消(如客户端断开)都不会取消共享的查询
+        # 检查与登记之间没有 await, 在事件循环中是原子操作, 无需加锁
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._select(table, columns, filters, order_by, limit, offset))
+            _inflight[key] = task
+            task.add_done_callback(partial(_finish_inflight, key))
+        return list(await asyncio.shield(task))
+
+    async def _select(
+        self,
+        table: str,
+        columns: str,
+        filters: dict[str, Any] | None,
+        order_by: str | None,
+        limit: int | None,
+        offset: int | None,
+    ) -> list[dict[str, Any]]:
         try:
             query = self.client.table(table).select(columns)
 
             # 应用过滤条件
             if filters:
-                for key, value in filters.items():
-                    query = query.eq(key, value)
+                query = _apply_filters(query, filters)
 
             # 应用排序
             if order_by:
                 query = query.order(order_by)
 
             # 应用分页
-            if limit:
+            # 直接使用PostgREST的limit/offset参数, 只传offset时返回其后的所有行
+            if limit is not None:
                 query = query.limit(limit)
-            if offset:
-                query = query.range(offset, offset + (limit or 10) - 1)
+            if offset is not None:
+                query = query.offset(offset)
 
-            result = query.execute()
+            result = await _run_sync(query.execute)
             self.logger.info(f"Successfully selected from {table}")
             return cast(list[dict[str, Any]], result.data)
 
@@ -277,8 +456,15 @@ class SupabaseDB:
 
         """
         try:
-            result = self.client.table(table).insert(data).select(return_columns).execute()  # type: ignore[attr-defined]
-            self.logger.info(f"Successfully inserted {len(data) if isinstance(data, list) else 1} records into {table}")
+            # returning=representation 已返回插入的行, 仅在需要限定列时追加 select 参数
+            query = self.client.table(table).insert(data, returning=ReturnMethod.representation)
+            if return_columns != "*":
+                query = query.select(return_columns)
+            result = await _run_sync(query.execute)
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info(
+                    f"Successfully inserted {len(data) if isinstance(data, list) else 1} records into {table}"
+                )
             return cast(list[dict[str, Any]], result.data)
 
         except APIError as e:
@@ -307,13 +493,12 @@ class SupabaseDB:
 
         """
         try:
-            query = self.client.table(table).update(data).select(return_columns)  # type: ignore[attr-defined]
+            query = self.client.table(table).update(data).select(return_columns)
 
             # 应用过滤条件
-            for key, value in filters.items():
-                query = query.eq(key, value)
+            query = _apply_filters(query, filters)
 
-            result = query.execute()
+            result = await _run_sync(query.execute)
             self.logger.info(f"Successfully updated {table}")
             return cast(list[dict[str, Any]], result.data)
 
@@ -342,10 +527,9 @@ class SupabaseDB:
             query = self.client.table(table).delete()
 
             # 应用过滤条件
-            for key, value in filters.items():
-                query = query.eq(key, value)
+            query = _apply_filters(query, filters)
 
-            query.execute()
+            await _run_sync(query.execute)
             self.logger.info(f"Successfully deleted from {table}")
             return True
 
@@ -362,6 +546,7 @@ class SupabaseDB:
         data: dict[str, Any] | list[dict[str, Any]],
         on_conflict: str | None = None,
         return_columns: str = "*",
+        chunk_size: int = 500,
     ) -> list[dict[str, Any]] | None:
         """插入或更新数据（如果存在则更新，否则插入）
 
@@ -370,6 +555,7 @@ class SupabaseDB:
             data: 要插入/更新的数据
             on_conflict: 冲突检测列
             return_columns: 返回的列名
+            chunk_size: 批量数据的分块大小, 超过时分块并发提交
 
         Returns:
             List[Dict[str, Any]]: 处理后的数据
@@ -379,13 +565,25 @@ class SupabaseDB:
 
         """
         try:
-            if on_conflict:
-                query = self.client.table(table).upsert(data, on_conflict=on_conflict).select(return_columns)  # type: ignore[attr-defined]
+            if isinstance(data, list) and len(data) > chunk_size:
+                # 分块提交避免单个请求过大导致超时, 并限制并发数
+                semaphore = asyncio.Semaphore(_UPSERT_CONCURRENCY)
+
+                async def upsert_chunk(chunk: list[dict[str, Any]]) -> list[dict[str, Any]]:
+                    async with semaphore:
+                        return await self._upsert_chunk(table, chunk, on_conflict, return_columns)
+
+                chunks = [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+                results = await asyncio.gather(*(upsert_chunk(chunk) for chunk in chunks))
+                rows = [row for result in results for row in result]
             else:
-                query = self.client.table(table).upsert(data).select(return_columns)  # type: ignore[attr-defined]
-            result = query.execute()
-            self.logger.info(f"Successfully upserted {len(data) if isinstance(data, list) else 1} records to {table}")
-            return cast(list[dict[str, Any]], result.data)
+                rows = await self._upsert_chunk(table, data, on_conflict, return_columns)
+
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info(
+                    f"Successfully upserted {len(data) if isinstance(data, list) else 1} records to {table}"
+                )
+            return rows
 
         except APIError as e:
             self.logger.error(f"Database error in upsert to {table}: {e}")
@@ -394,22 +592,52 @@ class SupabaseDB:
             self.logger.error(f"Unexpected error in upsert to {table}: {e}")
             raise SupabaseDBError("Unexpected error") from e
 
+    async def _upsert_chunk(
+        self,
+        table: str,
+        data: dict[str, Any] | list[dict[str, Any]],
+        on_conflict: str | None,
+        return_columns: str,
+    ) -> list[dict[str, Any]]:
+        query = self.client.table(table).upsert(
+            data, on_conflict=on_conflict or "", returning=ReturnMethod.representation
+        )
+        if return_columns != "*":
+            query = query.select(return_columns)
+        result = await _run_sync(query.execute)
+        return cast(list[dict[str, Any]], result.data)
+
     async def check_user_exists(self, user_id: str) -> bool:
         """检查用户是否存在
 
         Args:
-            client: Supabase 客户端实例
             user_id: 用户 ID
 
         Returns:
             bool: 用户是否存在
 
         """
+        return user_id in await self.check_users_exist([user_id])
+
+    async def check_users_exist(self, user_ids: list[str]) -> set[str]:
+        """批量检查用户是否存在, 只发起一次查询
+
+        Args:
+            user_ids: 用户 ID 列表
+
+        Returns:
+            Set[str]: 存在的用户 ID 集合
+
+        """
+        if not user_ids:
+            return set()
         try:
-            result = await self.select("users", filters={"id": user_id}, limit=1)
-            return len(result) > 0
-        except SupabaseDBError:
-            return False
+            # 经由 select 执行, 复用过滤条件规范化(去重排序)和并发查询合并
+            rows = await self.select("users", columns="id", filters={"id": set(user_ids)})
+            return {row["id"] for row in rows}
+        except SupabaseDBError as e:
+            self.logger.error(f"Error checking users exist: {e}")
+            return set()
 
 
 class SupabaseStorage:
@@ -445,7 +673,7 @@ class SupabaseStorage:
         """
         try:
             options = cast(FileOptions, {"content-type": content_type}) if content_type else None
-            result = self.client.storage.from_(bucket).upload(path, file_data, options)
+            result = await _run_sync(self.client.storage.from_(bucket).upload, path, file_data, options)
             self.logger.info(f"Successfully uploaded file to {bucket}/{path}")
             return cast(dict[str, Any], result)
 
@@ -468,7 +696,7 @@ class SupabaseStorage:
 
         """
         try:
-            result = self.client.storage.from_(bucket).download(path)
+            result = await _run_sync(self.client.storage.from_(bucket).download, path)
             self.logger.info(f"Successfully downloaded file from {bucket}/{path}")
             return result
 
@@ -510,7 +738,7 @@ class SupabaseStorage:
 
         """
         try:
-            self.client.storage.from_(bucket).remove([path])
+            await _run_sync(self.client.storage.from_(bucket).remove, [path])
             self.logger.info(f"Successfully deleted file from {bucket}/{path}")
             return True
 
@@ -543,7 +771,7 @@ class SupabaseStorage:
             if offset:
                 options["offset"] = offset
 
-            result = self.client.storage.from_(bucket).list(path, options if options else None)
+            result = await _run_sync(self.client.storage.from_(bucket).list, path, options if options else None)
             self.logger.info(f"Successfully listed files from {bucket}/{path or ''}")
             return result
 
@@ -551,7 +779,7 @@ class SupabaseStorage:
             self.logger.error(f"Storage error in list from {bucket}/{path or ''}: {e}")
             raise SupabaseStorageError("Failed to list files") from e
 
-    async def generate_filename(self, original_filename: str) -> str:
+    def generate_filename(self, original_filename: str) -> str:
         """生成唯一的文件名
 
         Args:
@@ -561,25 +789,23 @@ class SupabaseStorage:
             str: 唯一文件名
 
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        file_extension = Path(original_filename).suffix
-
-        return f"{timestamp}_{unique_id}{file_extension}"
+        return f"{datetime.now():%Y%m%d_%H%M%S}_{secrets.token_hex(4)}{Path(original_filename).suffix}"
 
     async def upload_file_to_s3(
-        self, bucket: str, key: str, file_data: bytes, content_type: str | None = None
+        self, bucket: str, key: str, file_data: bytes | IO[bytes] | Path, content_type: str | None = None
     ) -> dict[str, Any]:
         """通过 S3 API 上传文件到 Supabase Storage
 
+        文件路径和文件对象以流式方式上传, 大文件由 boto3 自动分片并行上传
+
         Args:
             bucket: 存储桶名
             key: 文件键名（路径）
-            file_data: 文件数据（bytes）
+            file_data: 文件数据（bytes）、文件对象或本地文件路径
             content_type: 内容类型
 
         Returns:
-            Dict[str, Any]: 上传结果
+            Dict[str, Any]: 上传结果, 流式上传时不返回 etag 和 version_id
 
         Raises:
             SupabaseStorageError: 上传失败时
@@ -587,15 +813,19 @@ class SupabaseStorage:
         """
         try:
             s3_client = get_s3_client()
-            upload_params = {
-                "Bucket": bucket,
-                "Key": key,
-                "Body": file_data,
-            }
-            if content_type:
-                upload_params["ContentType"] = content_type
-
-            result = s3_client.put_object(**upload_params)
+            extra_args = {"ContentType": content_type} if content_type else None
+
+            if isinstance(file_data, Path):
+                await _run_sync(s3_client.upload_file, str(file_data), bucket, key, ExtraArgs=extra_args)
+                result = {}
+            elif isinstance(file_data, bytes):
+                result = await _run_sync(
+                    s3_client.put_object, Bucket=bucket, Key=key, Body=file_data, **(extra_args or {})
+                )
+            else:
+                await _run_sync(s3_client.upload_fileobj, file_data, bucket, key, ExtraArgs=extra_args)
+                result = {}
+
             self.logger.info(f"Successfully uploaded file to S3: {bucket}/{key}")
             return {"bucket": bucket, "key": key, "etag": result.get("ETag"), "version_id": result.get("VersionId")}
 
@@ -604,20 +834,30 @@ class SupabaseStorage:
             raise SupabaseStorageError("Failed to upload file to S3") from e
 
 
-class SupabaseDep(BaseModel):
-    model_config = {"arbitrary_types_allowed": True}
-
+@dataclass(slots=True, frozen=True)
+class SupabaseDep:
     auth: SupabaseAuth
     client: Client
     db: SupabaseDB
     storage: SupabaseStorage
 
 
+_supabase_dep: SupabaseDep | None = None
+
+
 def get_supbase() -> SupabaseDep:
+    global _supabase_dep
+    if _supabase_dep is not None:
+        return _supabase_dep
+
+    # 先获取客户端再加锁, _client_lock 不可重入
     supabase_client = get_supabase_client()
-    return SupabaseDep(
-        auth=SupabaseAuth(supabase_client),
-        client=supabase_client,
-        db=SupabaseDB(supabase_client),
-        storage=SupabaseStorage(supabase_client),
-    )
+    with _client_lock:
+        if _supabase_dep is None:
+            _supabase_dep = SupabaseDep(
+                auth=SupabaseAuth(supabase_client),
+                client=supabase_client,
+                db=SupabaseDB(supabase_client),
+                storage=SupabaseStorage(supabase_client),
+            )
+    return _supabase_dep
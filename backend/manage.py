@@ -4,8 +4,12 @@
 import argparse
 import logging
 import os
+import shutil
 import subprocess
 import sys
+from collections import Counter
+from fnmatch import fnmatch
+from importlib.metadata import PackageNotFoundError, version
 from pathlib import Path
 
 # 设置项目根目录
@@ -17,15 +21,12 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(level
 logger = logging.getLogger(__name__)
 
 
-def get_poetry_cmd(base_cmd):
-    # 检查是否在 Poetry 项目中
-    poetry_lock = PROJECT_ROOT / "poetry.lock"
-    pyproject = PROJECT_ROOT / "pyproject.toml"
+# 检查是否在 Poetry 项目中, 只在启动时检查一次
+_USE_POETRY = (PROJECT_ROOT / "poetry.lock").exists() and (PROJECT_ROOT / "pyproject.toml").exists()
+
 
-    if poetry_lock.exists() and pyproject.exists():
-        return ["poetry", "run", *base_cmd]
-    else:
-        return base_cmd
+def get_poetry_cmd(base_cmd):
+    return ["poetry", "run", *base_cmd] if _USE_POETRY else list(base_cmd)
 
 
 class DatabaseManager:
@@ -176,49 +177,50 @@ class UtilityManager:
         """检查依赖"""
         logger.info("检查项目依赖...")
 
-        try:
-            # 检查关键包
-            packages = ["fastapi", "sqlalchemy", "alembic", "uvicorn", "pytest"]
-
-            # 使用适当的Python解释器
-            python_cmd = "python3" if Path("/usr/bin/python3").exists() else "python"
+        # 检查关键包, 直接读取已安装包的元数据, 无需启动子进程
+        packages = ["fastapi", "sqlalchemy", "alembic", "uvicorn", "pytest"]
+        missing = []
 
-            for package in packages:
-                result = subprocess.run(
-                    [python_cmd, "-c", f"import {package}; print({package}.__version__)"],
-                    capture_output=True,
-                    text=True,
-                    check=True,
-                )
-                logger.info(f"{package}: {result.stdout.strip()}")
+        for package in packages:
+            try:
+                logger.info(f"{package}: {version(package)}")
+            except PackageNotFoundError:
+                logger.error(f"{package}: 未安装")
+                missing.append(package)
 
-        except subprocess.CalledProcessError as e:
-            logger.error(f"依赖检查失败: {e}")
-            raise
+        if missing:
+            raise RuntimeError(f"依赖检查失败, 缺少: {', '.join(missing)}")
 
     @staticmethod
     def clean_cache():
         """清理缓存"""
         logger.info("清理缓存文件...")
 
-        cache_patterns = ["__pycache__", "*.pyc", "*.pyo", ".pytest_cache", ".coverage", "htmlcov"]
-
-        for pattern in cache_patterns:
-            try:
-                subprocess.run(["find", ".", "-name", pattern, "-type", "f", "-delete"], cwd=PROJECT_ROOT, check=True)
-                logger.info(f"已清理: {pattern}")
-            except subprocess.CalledProcessError as e:
-                logger.warning(f"清理 {pattern} 失败: {e}")
-
-        # 清理目录
-        dirs_to_clean = ["__pycache__", ".pytest_cache", "htmlcov"]
-        for dir_name in dirs_to_clean:
-            dir_path = PROJECT_ROOT / dir_name
-            if dir_path.exists():
-                import shutil
-
-                shutil.rmtree(dir_path)
-                logger.info(f"已清理目录: {dir_name}")
+        # 单次遍历目录树, 同时清理缓存文件和缓存目录
+        file_patterns = ["*.pyc", "*.pyo", ".coverage"]
+        cache_dirs = {"__pycache__", ".pytest_cache", "htmlcov"}
+        skip_dirs = {".git", ".venv", "venv", "node_modules"}
+        removed: Counter[str] = Counter()
+
+        for root, dirnames, filenames in os.walk(PROJECT_ROOT):
+            for dir_name in list(dirnames):
+                if dir_name in skip_dirs or dir_name in cache_dirs:
+                    dirnames.remove(dir_name)
+                if dir_name in cache_dirs:
+                    shutil.rmtree(Path(root) / dir_name, ignore_errors=True)
+                    removed[dir_name] += 1
+
+            for file_name in filenames:
+                pattern = next((p for p in file_patterns if fnmatch(file_name, p)), None)
+                if pattern:
+                    try:
+                        (Path(root) / file_name).unlink(missing_ok=True)
+                        removed[pattern] += 1
+                    except OSError as e:
+                        logger.warning(f"清理 {file_name} 失败: {e}")
+
+        for pattern, count in removed.items():
+            logger.info(f"已清理: {pattern} ({count})")
 
     @staticmethod
     def install_dependencies():